@@ -6,6 +6,7 @@ from typing import List, Optional
 # Removed: from datetime import datetime
 import os
 from .notion import APIClient # Updated import
+from . import profiling
 
 # Data Models (EntryRequest, ProjectRequest remain unchanged)
 class EntryRequest(BaseModel):
@@ -20,6 +21,10 @@ class ProjectRequest(BaseModel):
 # Initialize FastAPI
 app = FastAPI(title="Lean Productivity Portal", version="2.0.0")
 
+# Opt-in slow-request log and on-demand profiling (see profiling.py); not registered when off
+if profiling.is_enabled():
+    app.middleware("http")(profiling.profiling_middleware)
+
 # Initialize API Client
 api_client: Optional[APIClient] = None
 
@@ -321,6 +326,15 @@ async def get_projects():
         raise HTTPException(status_code=503, detail="API client not initialized. Service is unavailable.")
     return api_client.get_projects()
 
+@app.get(profiling.ADMIN_PATH)
+async def get_slow_requests(request: Request):
+    if not profiling.is_authorized(request):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {
+        "threshold_ms": profiling.SLOW_REQUEST_THRESHOLD_MS,
+        "entries": profiling.slow_request_log.entries(),
+    }
+
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
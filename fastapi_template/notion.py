@@ -1,7 +1,9 @@
 import os
+import time
 import requests
 from typing import List, Dict, Optional, Any
 from fastapi import HTTPException
+from .profiling import current_upstream_calls, record_upstream_call
 
 class APIClient:
     def __init__(self):
@@ -13,8 +15,13 @@ class APIClient:
 
     def _request(self, method: str, endpoint: str, json_data: Optional[Dict] = None) -> Any:
         url = f"{self.base_url.rstrip('/')}/{endpoint.lstrip('/')}"
+        upstream_calls = current_upstream_calls()  # None unless slow-request logging is on
+        started = fetched = time.perf_counter() if upstream_calls is not None else 0.0
+        response = None
         try:
             response = requests.request(method, url, json=json_data, timeout=10)
+            if upstream_calls is not None:
+                fetched = time.perf_counter()
             response.raise_for_status()  # Raises HTTPError for bad responses (4XX or 5XX)
             if response.status_code == 204:  # No Content
                 return None
@@ -34,6 +41,16 @@ class APIClient:
             # Catch other request-related errors (e.g., connection error)
             print(f"Request exception during API request to {url}: {e}")
             raise HTTPException(status_code=503, detail=f"Service unavailable: Error connecting to external API ({e.__class__.__name__}).")
+        finally:
+            # Failed calls are recorded too; timeouts are exactly what the slow-request log is for.
+            if upstream_calls is not None:
+                finished = time.perf_counter()
+                if response is None:  # Timeout or connection error: all of it was spent waiting
+                    fetched = finished
+                record_upstream_call(upstream_calls, method, endpoint,
+                                     response.status_code if response is not None else None,
+                                     started, fetched, finished,
+                                     len(response.content) if response is not None else 0)
 
     def create_entry(self, content: str, tags: Optional[List[str]] = None) -> Dict:
         # Based on notes.js, the API expects 'title' and 'content'.
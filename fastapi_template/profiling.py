@@ -0,0 +1,131 @@
+import hmac
+import os
+import time
+import threading
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import List, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, JSONResponse
+
+# Both features are off unless configured. When neither is set, main.py does not
+# register the middleware at all, so requests pay nothing for it.
+SLOW_REQUEST_THRESHOLD_MS: Optional[float] = (
+    float(os.environ["SLOW_REQUEST_THRESHOLD_MS"]) if os.getenv("SLOW_REQUEST_THRESHOLD_MS") else None
+)
+SLOW_REQUEST_LOG_SIZE = int(os.getenv("SLOW_REQUEST_LOG_SIZE", "100"))
+PROFILING_TOKEN: Optional[str] = os.getenv("PROFILING_TOKEN") or None
+PROFILE_HEADER = "X-Profile"
+ADMIN_PATH = "/admin/slow-requests"
+
+# Upstream calls made by APIClient._request while serving the current request.
+# None means nobody is recording, which keeps the APIClient hot path to a single lookup.
+_upstream_calls: ContextVar[Optional[List[Dict]]] = ContextVar("upstream_calls", default=None)
+
+
+def current_upstream_calls() -> Optional[List[Dict]]:
+    return _upstream_calls.get()
+
+
+def record_upstream_call(calls: List[Dict], method: str, endpoint: str, status_code: Optional[int],
+                         started: float, fetched: float, finished: float, response_bytes: int) -> None:
+    calls.append({
+        "method": method,
+        "endpoint": endpoint,
+        "status_code": status_code,
+        "request_ms": round((fetched - started) * 1000, 2),  # network round trip
+        "parse_ms": round((finished - fetched) * 1000, 2),   # JSON decoding
+        "response_bytes": response_bytes,
+    })
+
+
+class SlowRequestLog:
+    """Bounded, thread-safe ring buffer of the most recent slow requests."""
+
+    def __init__(self, maxlen: int = SLOW_REQUEST_LOG_SIZE):
+        self._entries: deque = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, entry: Dict) -> None:
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self) -> List[Dict]:
+        # Newest first, which is what you want when looking at a live incident.
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+slow_request_log = SlowRequestLog()
+
+
+def is_enabled() -> bool:
+    return SLOW_REQUEST_THRESHOLD_MS is not None or PROFILING_TOKEN is not None
+
+
+def is_authorized(request: Request) -> bool:
+    # compare_digest rejects non-ASCII str, so compare bytes; the header is client input.
+    return PROFILING_TOKEN is not None and hmac.compare_digest(
+        request.headers.get(PROFILE_HEADER, "").encode(), PROFILING_TOKEN.encode()
+    )
+
+
+async def profiling_middleware(request: Request, call_next):
+    # Looking at the log must not push real entries out of it.
+    if request.url.path == ADMIN_PATH:
+        return await call_next(request)
+    if is_authorized(request):
+        return await _profile_request(request, call_next)
+    if SLOW_REQUEST_THRESHOLD_MS is None:
+        return await call_next(request)
+
+    calls: List[Dict] = []
+    token = _upstream_calls.set(calls)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _upstream_calls.reset(token)
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    if duration_ms >= SLOW_REQUEST_THRESHOLD_MS:
+        upstream_ms = sum(call["request_ms"] + call["parse_ms"] for call in calls)
+        content_length = response.headers.get("content-length")
+        slow_request_log.add({
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "method": request.method,
+            "path": request.url.path,
+            "status_code": response.status_code,
+            "duration_ms": round(duration_ms, 2),
+            "upstream_ms": round(upstream_ms, 2),
+            # Whatever is left over was spent reshaping data and serializing the response.
+            "app_ms": round(duration_ms - upstream_ms, 2),
+            "response_bytes": int(content_length) if content_length else None,
+            "upstream_calls": calls,
+        })
+        print(f"Slow request: {request.method} {request.url.path} took {duration_ms:.1f}ms "
+              f"({upstream_ms:.1f}ms upstream across {len(calls)} call(s))")
+    return response
+
+
+async def _profile_request(request: Request, call_next):
+    try:
+        from pyinstrument import Profiler  # Only needed when a profile is actually requested
+    except ImportError:
+        return JSONResponse(status_code=501, content={"detail": "Profiling requires the 'pyinstrument' package."})
+
+    # Sample every millisecond; the profile replaces the normal response body.
+    profiler = Profiler(interval=0.001, async_mode="enabled")
+    profiler.start()
+    try:
+        await call_next(request)
+    finally:
+        # A profiler left running would make every later profiled request fail.
+        profiler.stop()
+    return HTMLResponse(profiler.output_html())
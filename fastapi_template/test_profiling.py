@@ -0,0 +1,219 @@
+import asyncio
+import importlib
+import importlib.util
+import os
+import sys
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+import requests
+from fastapi.responses import JSONResponse
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from .notion import APIClient
+from . import main
+from . import profiling
+from .profiling import SlowRequestLog
+
+
+class TestSlowRequestLog(unittest.TestCase):
+
+    def test_ring_buffer_keeps_newest_entries(self):
+        log = SlowRequestLog(maxlen=3)
+        for i in range(5):
+            log.add({"path": f"/api/{i}"})
+        self.assertEqual([e["path"] for e in log.entries()], ["/api/4", "/api/3", "/api/2"])
+
+    def test_clear(self):
+        log = SlowRequestLog(maxlen=3)
+        log.add({"path": "/api/entries"})
+        log.clear()
+        self.assertEqual(log.entries(), [])
+
+
+class TestUpstreamRecording(unittest.TestCase):
+
+    @patch.dict(os.environ, {"API_BASE_URL": "http://testapi.com"})
+    def setUp(self):
+        self.client = APIClient()
+
+    def _mock_response(self, mock_request):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.content = b'[{"id": "1"}]'
+        mock_response.json.return_value = [{"id": "1", "content": "Content 1"}]
+        mock_request.return_value = mock_response
+
+    @patch('fastapi_template.notion.requests.request')
+    def test_request_records_upstream_call_when_recording(self, mock_request):
+        self._mock_response(mock_request)
+        calls = []
+        token = profiling._upstream_calls.set(calls)
+        try:
+            self.client.get_entries()
+        finally:
+            profiling._upstream_calls.reset(token)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]["method"], "GET")
+        self.assertEqual(calls[0]["endpoint"], "api/notes")
+        self.assertEqual(calls[0]["status_code"], 200)
+        self.assertEqual(calls[0]["response_bytes"], len(b'[{"id": "1"}]'))
+        self.assertGreaterEqual(calls[0]["request_ms"], 0)
+        self.assertGreaterEqual(calls[0]["parse_ms"], 0)
+
+    @patch('fastapi_template.notion.requests.request')
+    def test_request_records_upstream_call_on_timeout(self, mock_request):
+        mock_request.side_effect = requests.exceptions.Timeout
+        calls = []
+        token = profiling._upstream_calls.set(calls)
+        try:
+            with self.assertRaises(HTTPException) as cm:
+                self.client.get_entries()
+        finally:
+            profiling._upstream_calls.reset(token)
+
+        self.assertEqual(cm.exception.status_code, 504)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]["endpoint"], "api/notes")
+        self.assertIsNone(calls[0]["status_code"])
+        self.assertEqual(calls[0]["response_bytes"], 0)
+
+    @patch('fastapi_template.notion.requests.request')
+    def test_request_does_not_record_when_off(self, mock_request):
+        self._mock_response(mock_request)
+        self.assertIsNone(profiling.current_upstream_calls())
+        self.assertEqual(len(self.client.get_entries()), 1)
+
+
+class TestProfilingMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        profiling.slow_request_log.clear()
+
+    def _request(self, path="/api/entries", headers=None):
+        request = MagicMock()
+        request.method = "GET"
+        request.url.path = path
+        request.headers = headers or {}
+        return request
+
+    def test_slow_request_is_logged_with_upstream_calls(self):
+        async def call_next(request):
+            started = time.perf_counter()
+            time.sleep(0.002)
+            fetched = time.perf_counter()
+            time.sleep(0.001)
+            profiling.record_upstream_call(profiling.current_upstream_calls(), "GET", "api/notes", 200,
+                                           started, fetched, time.perf_counter(), 42)
+            return JSONResponse(content=[{"id": "1"}])
+
+        with patch.object(profiling, "SLOW_REQUEST_THRESHOLD_MS", 0.0):
+            asyncio.run(profiling.profiling_middleware(self._request(), call_next))
+
+        entries = profiling.slow_request_log.entries()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]["path"], "/api/entries")
+        self.assertEqual(entries[0]["status_code"], 200)
+        self.assertGreaterEqual(entries[0]["upstream_ms"], 3.0)
+        self.assertGreaterEqual(entries[0]["duration_ms"], entries[0]["upstream_ms"])
+        self.assertGreaterEqual(entries[0]["app_ms"], 0)
+        self.assertEqual(entries[0]["response_bytes"], len(b'[{"id":"1"}]'))
+        self.assertEqual(entries[0]["upstream_calls"][0]["response_bytes"], 42)
+        self.assertIsNone(profiling.current_upstream_calls())
+
+    def test_fast_request_is_not_logged(self):
+        async def call_next(request):
+            return JSONResponse(content=[])
+
+        with patch.object(profiling, "SLOW_REQUEST_THRESHOLD_MS", 60_000.0):
+            asyncio.run(profiling.profiling_middleware(self._request(), call_next))
+        self.assertEqual(profiling.slow_request_log.entries(), [])
+
+    def test_profile_header_requires_matching_token(self):
+        request = self._request(headers={profiling.PROFILE_HEADER: "wrong"})
+        with patch.object(profiling, "PROFILING_TOKEN", "secret"):
+            self.assertFalse(profiling.is_authorized(request))
+            request.headers = {profiling.PROFILE_HEADER: "secret"}
+            self.assertTrue(profiling.is_authorized(request))
+
+    def test_profiler_is_stopped_when_request_raises(self):
+        if importlib.util.find_spec("pyinstrument") is None:
+            self.skipTest("pyinstrument is not installed")
+
+        async def failing(request):
+            raise RuntimeError("boom")
+
+        async def ok(request):
+            return JSONResponse(content=[])
+
+        request = self._request(headers={profiling.PROFILE_HEADER: "secret"})
+        with patch.object(profiling, "PROFILING_TOKEN", "secret"):
+            with self.assertRaises(RuntimeError):
+                asyncio.run(profiling.profiling_middleware(request, failing))
+            response = asyncio.run(profiling.profiling_middleware(request, ok))
+        self.assertIn("text/html", response.media_type)
+
+
+class TestAppMiddleware(unittest.TestCase):
+    """Reloads main so the middleware registration sees the patched settings."""
+
+    def tearDown(self):
+        profiling.slow_request_log.clear()
+        importlib.reload(main)
+
+    def _reload_app(self, threshold=None, token=None):
+        with patch.object(profiling, "SLOW_REQUEST_THRESHOLD_MS", threshold), \
+             patch.object(profiling, "PROFILING_TOKEN", token):
+            app = importlib.reload(main).app
+        return app
+
+    def test_no_middleware_when_off(self):
+        with patch.object(profiling, "SLOW_REQUEST_THRESHOLD_MS", None), \
+             patch.object(profiling, "PROFILING_TOKEN", None):
+            self.assertFalse(profiling.is_enabled())
+        self.assertEqual(self._reload_app().user_middleware, [])
+
+    def test_profile_header_returns_html_profile(self):
+        if importlib.util.find_spec("pyinstrument") is None:
+            self.skipTest("pyinstrument is not installed")
+        app = self._reload_app(token="secret")
+        self.assertEqual(len(app.user_middleware), 1)
+        with patch.object(profiling, "PROFILING_TOKEN", "secret"):
+            response = TestClient(app).get("/health", headers={profiling.PROFILE_HEADER: "secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("text/html", response.headers["content-type"])
+
+    def test_profile_without_pyinstrument_returns_501(self):
+        app = self._reload_app(token="secret")
+        with patch.object(profiling, "PROFILING_TOKEN", "secret"), \
+             patch.dict(sys.modules, {"pyinstrument": None}):
+            response = TestClient(app).get("/health", headers={profiling.PROFILE_HEADER: "secret"})
+        self.assertEqual(response.status_code, 501)
+
+    def test_non_ascii_profile_header_is_rejected_not_an_error(self):
+        for token in ("secret", "pässwort"):
+            app = self._reload_app(token=token)
+            with patch.object(profiling, "PROFILING_TOKEN", token):
+                client = TestClient(app, raise_server_exceptions=False)
+                response = client.get("/health", headers={profiling.PROFILE_HEADER: "é".encode("latin-1")})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), {"status": "healthy"})
+                self.assertEqual(client.get("/health").status_code, 200)
+
+    def test_admin_endpoint_is_not_profiled_or_logged(self):
+        app = self._reload_app(threshold=0.0, token="secret")
+        with patch.object(profiling, "SLOW_REQUEST_THRESHOLD_MS", 0.0), \
+             patch.object(profiling, "PROFILING_TOKEN", "secret"):
+            client = TestClient(app)
+            self.assertEqual(client.get(profiling.ADMIN_PATH).status_code, 404)
+            response = client.get(profiling.ADMIN_PATH, headers={profiling.PROFILE_HEADER: "secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["entries"], [])
+        self.assertEqual(profiling.slow_request_log.entries(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()